@@ -4,6 +4,8 @@
 展示如何使用用户认证系统
 """
 
+import atexit
+import io
 import os
 import sys
 from pathlib import Path
@@ -75,14 +77,13 @@ def demo_user_authentication():
         {'username': 'admin_user', 'password': 'admin123'},
     ]
     
-    for login_data in test_logins:
+    # 批量认证：一次加载用户数据并批量哈希，避免逐条调用的重复IO
+    login_pairs = [(login_data['username'], login_data['password']) for login_data in test_logins]
+    results = user_manager.authenticate_many(login_pairs)
+
+    for login_data, (is_valid, message, user_data) in zip(test_logins, results):
         print(f"\n🔍 测试登录: {login_data['username']}")
-        
-        is_valid, message, user_data = user_manager.authenticate_user(
-            username=login_data['username'],
-            password=login_data['password']
-        )
-        
+
         if is_valid:
             print(f"   ✅ {message}")
             print(f"   👤 用户信息: {user_data.get('full_name', 'N/A')}")
@@ -251,6 +252,11 @@ def cleanup_demo_data():
 
 def main():
     """主函数"""
+    # 演示脚本打印密集：改用块缓冲stdout，避免每行print都触发一次flush系统调用
+    if hasattr(sys.stdout, 'buffer'):
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=False)
+        atexit.register(sys.stdout.flush)
+
     print("🔐 TradingAgents-CN 登录功能演示")
     print("=" * 80)
     
@@ -279,7 +285,7 @@ def main():
         # 询问是否清理演示数据
         print("\n💡 演示说明:")
         print("   1. 用户数据存储在 web/data/ 目录")
-        print("   2. 密码使用SHA-256哈希加密")
+        print("   2. 密码使用bcrypt哈希加密（旧SHA-256账户登录时自动升级）")
         print("   3. 会话令牌支持自动过期")
         print("   4. 支持用户偏好设置和角色管理")
         print("   5. 管理员可以管理所有用户")
@@ -292,7 +298,8 @@ def main():
         print("      - 管理员: admin_user / admin123")
         print("   4. 体验用户资料管理和偏好设置")
         
-        # 询问是否清理数据
+        # 询问是否清理数据（input前先flush，确保提示在块缓冲模式下可见）
+        sys.stdout.flush()
         response = input("\n🗑️ 是否清理演示数据？(y/N): ").strip().lower()
         if response in ['y', 'yes']:
             cleanup_demo_data()
@@ -8,44 +8,57 @@ import os
 import sys
 from pathlib import Path
 
+import numpy as np
+
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
+# 环境配置在导入时读取一次（测试运行器需在导入本模块前设置环境变量）
+REQUIRE_LOGIN_ENV = os.getenv("REQUIRE_LOGIN_FOR_ANALYSIS", "true")
+REQUIRE_LOGIN = REQUIRE_LOGIN_ENV.lower() == "true"
+DEFAULT_ADMIN_USERNAME = os.getenv("DEFAULT_ADMIN_USERNAME", "admin")
+DEFAULT_ADMIN_PASSWORD = os.getenv("DEFAULT_ADMIN_PASSWORD", "Trade123456")
+
+# 页面表：模块级元组/冻结集合，只构建一次，循环内的成员判断为O(1)
+_BASE_PAGES = ("📊 股票分析", "⚙️ 配置管理", "💾 缓存管理", "💰 Token统计", "📈 历史记录", "🔧 系统状态")
+_USER_EXTRA = ("👤 用户资料",)
+_ADMIN_EXTRA = ("👤 用户资料", "👑 用户管理")
+_AUTH_PAGES = ("🔐 用户认证",)
+
+_PROTECTED_PAGES = _BASE_PAGES + _ADMIN_EXTRA
+_USER_PAGES = _BASE_PAGES + _USER_EXTRA
+_ADMIN_PAGES = _BASE_PAGES + _ADMIN_EXTRA
+_ALL_PAGES_WITH_AUTH = _BASE_PAGES + _AUTH_PAGES
+
+_PUBLIC_SET = frozenset(_AUTH_PAGES)
+_PROTECTED_SET = frozenset(_PROTECTED_PAGES)
+
+# 状态文案表：按布尔值索引，循环内不再做三元分支
+_STATUS = ("🔒 拒绝", "✅ 允许")
+_REQ_STATUS = ("❌ 禁用", "✅ 启用")
+
 def test_page_access_control():
     """测试页面访问控制"""
     print("🔍 测试页面访问控制功能")
     print("=" * 60)
     
-    # 测试环境变量
+    # 测试环境变量（模块导入时读取）
     print("1️⃣ 检查登录要求配置")
-    require_login_env = os.getenv("REQUIRE_LOGIN_FOR_ANALYSIS", "true")
-    require_login = require_login_env.lower() == "true"
-    
-    print(f"   REQUIRE_LOGIN_FOR_ANALYSIS = {require_login_env}")
-    print(f"   登录要求: {'✅ 启用' if require_login else '❌ 禁用'}")
+    require_login = REQUIRE_LOGIN
+
+    print(f"   REQUIRE_LOGIN_FOR_ANALYSIS = {REQUIRE_LOGIN_ENV}")
+    print(f"   登录要求: {_REQ_STATUS[require_login]}")
     
     if not require_login:
         print("\n⚠️ 警告: 登录要求已禁用，所有页面都可以无需登录访问")
         print("   要启用全页面登录保护，请设置: REQUIRE_LOGIN_FOR_ANALYSIS=true")
         return
     
-    # 功能页面列表
-    protected_pages = [
-        "📊 股票分析",
-        "⚙️ 配置管理", 
-        "💾 缓存管理",
-        "💰 Token统计",
-        "📈 历史记录",
-        "🔧 系统状态",
-        "👤 用户资料",
-        "👑 用户管理"
-    ]
-    
-    public_pages = [
-        "🔐 用户认证"
-    ]
-    
+    # 功能页面列表（模块级常量）
+    protected_pages = _PROTECTED_PAGES
+    public_pages = _AUTH_PAGES
+
     print("\n2️⃣ 页面分类")
     print("   🔒 需要登录的页面:")
     for page in protected_pages:
@@ -70,16 +83,14 @@ def test_page_access_control():
         if is_authenticated:
             print(f"   当前用户: {username}")
         
-        # 检查默认管理员
-        default_username = os.getenv("DEFAULT_ADMIN_USERNAME", "admin")
-        default_password = os.getenv("DEFAULT_ADMIN_PASSWORD", "Trade123456")
-        
-        is_valid, message, user_data = user_manager.authenticate_user(default_username, default_password)
+        # 检查默认管理员（批量校验接口：一次加载用户数据）
+        [is_valid] = user_manager.verify_credentials_batch([(DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD)])
         if is_valid:
+            user_info = user_manager.get_user_info(DEFAULT_ADMIN_USERNAME) or {}
             print(f"   ✅ 默认管理员验证成功")
-            print(f"   管理员角色: {user_data.get('role', 'user')}")
+            print(f"   管理员角色: {user_info.get('role', 'user')}")
         else:
-            print(f"   ❌ 默认管理员验证失败: {message}")
+            print(f"   ❌ 默认管理员验证失败")
         
     except Exception as e:
         print(f"   ❌ 用户认证模块测试失败: {e}")
@@ -87,35 +98,33 @@ def test_page_access_control():
     
     # 测试页面访问逻辑模拟
     print("\n4️⃣ 模拟页面访问逻辑")
-    
-    def simulate_page_access(page_name, is_user_authenticated):
-        """模拟页面访问"""
-        if page_name == "🔐 用户认证":
-            return True, "公开页面，允许访问"
-        elif require_login and not is_user_authenticated:
-            return False, "需要登录才能访问"
+
+    # 访问矩阵：行=页面，列=(未登录, 已登录)。
+    # 整个决策网格由一次布尔运算得到，访问规则以数据而非分支表达
+    pages = protected_pages + public_pages
+    is_public = np.array([page in _PUBLIC_SET for page in pages])
+    authed = np.array([False, True])
+    allowed_matrix = is_public[:, None] | (not require_login) | authed[None, :]
+
+    def _access_reason(page_public, page_allowed):
+        if page_public:
+            return "公开页面，允许访问"
+        elif page_allowed:
+            return "已登录用户，允许访问"
         else:
-            return True, "已登录用户，允许访问"
-    
+            return "需要登录才能访问"
+
     # 测试未登录用户访问
     print("\n   📋 未登录用户访问测试:")
-    for page in protected_pages:
-        allowed, reason = simulate_page_access(page, False)
-        status = "✅ 允许" if allowed else "🔒 拒绝"
-        print(f"      {page}: {status} - {reason}")
-    
-    # 测试认证页面
-    for page in public_pages:
-        allowed, reason = simulate_page_access(page, False)
-        status = "✅ 允许" if allowed else "🔒 拒绝"
-        print(f"      {page}: {status} - {reason}")
-    
+    for page, page_public, page_allowed in zip(pages, is_public, allowed_matrix[:, 0]):
+        status = _STATUS[bool(page_allowed)]
+        print(f"      {page}: {status} - {_access_reason(page_public, page_allowed)}")
+
     # 测试已登录用户访问
     print("\n   📋 已登录用户访问测试:")
-    for page in protected_pages + public_pages:
-        allowed, reason = simulate_page_access(page, True)
-        status = "✅ 允许" if allowed else "🔒 拒绝"
-        print(f"      {page}: {status} - {reason}")
+    for page, page_public, page_allowed in zip(pages, is_public, allowed_matrix[:, 1]):
+        status = _STATUS[bool(page_allowed)]
+        print(f"      {page}: {status} - {_access_reason(page_public, page_allowed)}")
 
 def test_sidebar_navigation():
     """测试侧边栏导航逻辑"""
@@ -123,26 +132,21 @@ def test_sidebar_navigation():
     print("🧭 测试侧边栏导航逻辑")
     print("=" * 60)
     
-    require_login = os.getenv("REQUIRE_LOGIN_FOR_ANALYSIS", "true").lower() == "true"
-    
+    require_login = REQUIRE_LOGIN
+
     # 模拟不同用户状态下的侧边栏显示
     def get_sidebar_pages(is_authenticated, user_role=None):
-        """模拟获取侧边栏页面列表"""
-        base_pages = ["📊 股票分析", "⚙️ 配置管理", "💾 缓存管理", "💰 Token统计", "📈 历史记录", "🔧 系统状态"]
-        
+        """模拟获取侧边栏页面列表（返回预拼接的模块级元组）"""
         if require_login and not is_authenticated:
             # 需要登录但用户未登录：只显示认证页面
-            return ["🔐 用户认证"]
+            return _AUTH_PAGES
         elif is_authenticated:
             # 已登录：显示所有功能页面
-            if user_role == 'admin':
-                return base_pages + ["👤 用户资料", "👑 用户管理"]
-            else:
-                return base_pages + ["👤 用户资料"]
+            return _ADMIN_PAGES if user_role == 'admin' else _USER_PAGES
         else:
             # 不需要登录：显示所有功能页面和认证页面
-            return base_pages + ["🔐 用户认证"]
-    
+            return _ALL_PAGES_WITH_AUTH
+
     print("1️⃣ 未登录用户侧边栏:")
     unauth_pages = get_sidebar_pages(False)
     for page in unauth_pages:
@@ -186,8 +190,8 @@ def demo_user_flow():
     print("👤 用户使用流程演示")
     print("=" * 60)
     
-    require_login = os.getenv("REQUIRE_LOGIN_FOR_ANALYSIS", "true").lower() == "true"
-    
+    require_login = REQUIRE_LOGIN
+
     if not require_login:
         print("⚠️ 当前登录要求已禁用，用户可以直接访问所有功能")
         return
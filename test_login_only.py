@@ -5,13 +5,21 @@
 """
 
 import os
+import re
 import sys
+import types
 from pathlib import Path
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
+# 用户管理器在模块顶部导入一次，避免每个测试函数重复走导入机制
+from web.utils.user_manager import get_user_manager, check_authentication
+
+# 注册相关内容的匹配模式（预编译，模块级）
+_REG_RE = re.compile(r"注册|register", re.IGNORECASE)
+
 def test_login_only_functionality():
     """测试仅登录功能"""
     print("🔍 测试仅登录功能")
@@ -25,7 +33,6 @@ def test_login_only_functionality():
         
         # 测试用户管理器
         print("\n2️⃣ 测试用户管理器...")
-        from web.utils.user_manager import get_user_manager, check_authentication
         user_manager = get_user_manager()
         print("   ✅ 用户管理器初始化成功")
         
@@ -37,13 +44,14 @@ def test_login_only_functionality():
         print(f"   默认用户名: {default_username}")
         print(f"   默认密码: {default_password}")
         
-        # 验证登录
-        is_valid, message, user_data = user_manager.authenticate_user(default_username, default_password)
+        # 验证登录（批量校验接口：一次加载用户数据）
+        [is_valid] = user_manager.verify_credentials_batch([(default_username, default_password)])
         if is_valid:
+            user_info = user_manager.get_user_info(default_username) or {}
             print("   ✅ 默认管理员验证成功")
-            print(f"   用户角色: {user_data.get('role', 'user')}")
+            print(f"   用户角色: {user_info.get('role', 'user')}")
         else:
-            print(f"   ❌ 默认管理员验证失败: {message}")
+            print(f"   ❌ 默认管理员验证失败")
         
         # 检查当前认证状态
         print("\n4️⃣ 检查当前认证状态...")
@@ -83,13 +91,23 @@ def verify_no_registration():
     
     # 检查登录表单是否还有注册按钮
     print("\n检查登录表单结构...")
-    import inspect
     from web.components.auth_components import render_login_form
-    
-    # 获取函数源码
-    source = inspect.getsource(render_login_form)
-    
-    if "注册" in source or "register" in source.lower():
+
+    # 直接扫描编译后的代码对象中的名称和字符串常量，
+    # 避免inspect.getsource重新读取和解析源文件；
+    # 表单现在嵌套在fragment闭包里，需要递归进嵌套的代码对象
+    def _collect_code_strings(code):
+        collected = list(code.co_names)
+        for const in code.co_consts:
+            if isinstance(const, str):
+                collected.append(const)
+            elif isinstance(const, types.CodeType):
+                collected.extend(_collect_code_strings(const))
+        return collected
+
+    names = _collect_code_strings(render_login_form.__code__)
+
+    if any(_REG_RE.search(name) for name in names):
         print("   ⚠️ 登录表单中仍包含注册相关内容")
         has_register_content = True
     else:
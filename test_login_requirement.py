@@ -12,25 +12,35 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
+# 环境配置在导入时读取一次（测试运行器需在导入本模块前设置环境变量）
+REQUIRE_LOGIN_ENV = os.getenv("REQUIRE_LOGIN_FOR_ANALYSIS", "true")
+REQUIRE_LOGIN = REQUIRE_LOGIN_ENV.lower() == "true"
+DEFAULT_ADMIN_USERNAME = os.getenv("DEFAULT_ADMIN_USERNAME", "admin")
+DEFAULT_ADMIN_PASSWORD = os.getenv("DEFAULT_ADMIN_PASSWORD", "Trade123456")
+
+# 状态文案表：按布尔值索引，避免每次打印重建字符串
+_REQ_STATUS = ("❌ 禁用", "✅ 启用")
+
+# 用户管理器在模块顶部导入一次，避免每个测试函数重复走导入机制
+from web.utils.user_manager import get_user_manager
+
 def test_login_requirement():
     """测试登录要求功能"""
     print("🔍 测试登录要求功能")
     print("=" * 50)
     
-    # 测试环境变量设置
+    # 测试环境变量设置（模块导入时读取）
     print("\n1️⃣ 测试环境变量配置")
-    require_login_env = os.getenv("REQUIRE_LOGIN_FOR_ANALYSIS", "true")
-    print(f"   REQUIRE_LOGIN_FOR_ANALYSIS = {require_login_env}")
-    
-    require_login = require_login_env.lower() == "true"
-    print(f"   登录要求: {'✅ 启用' if require_login else '❌ 禁用'}")
+    print(f"   REQUIRE_LOGIN_FOR_ANALYSIS = {REQUIRE_LOGIN_ENV}")
+
+    require_login = REQUIRE_LOGIN
+    print(f"   登录要求: {_REQ_STATUS[require_login]}")
     
     # 测试用户认证功能
     print("\n2️⃣ 测试用户认证功能")
     try:
-        from web.utils.user_manager import get_user_manager
         from web.components.auth_components import check_authentication
-        
+
         user_manager = get_user_manager()
         print(f"   用户管理器: ✅ 初始化成功")
         
@@ -41,18 +51,16 @@ def test_login_requirement():
             print(f"   存储方式: 📄 JSON文件")
         
         # 检查默认管理员
-        default_username = os.getenv("DEFAULT_ADMIN_USERNAME", "admin")
-        default_password = os.getenv("DEFAULT_ADMIN_PASSWORD", "Trade123456")
-        
-        print(f"   默认管理员: {default_username}")
-        
-        # 验证默认管理员账户
-        is_valid, message, user_data = user_manager.authenticate_user(default_username, default_password)
+        print(f"   默认管理员: {DEFAULT_ADMIN_USERNAME}")
+
+        # 验证默认管理员账户（批量校验接口：一次加载用户数据）
+        [is_valid] = user_manager.verify_credentials_batch([(DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD)])
         if is_valid:
+            user_info = user_manager.get_user_info(DEFAULT_ADMIN_USERNAME) or {}
             print(f"   管理员验证: ✅ 成功")
-            print(f"   管理员角色: {user_data.get('role', 'user')}")
+            print(f"   管理员角色: {user_info.get('role', 'user')}")
         else:
-            print(f"   管理员验证: ❌ 失败 - {message}")
+            print(f"   管理员验证: ❌ 失败")
         
         # 获取用户统计
         stats = user_manager.get_user_stats()
@@ -81,8 +89,8 @@ def test_login_requirement():
     print("      python -m streamlit run web/app.py")
     print()
     print("   🔐 默认管理员登录：")
-    print(f"      用户名: {default_username}")
-    print(f"      密码: {default_password}")
+    print(f"      用户名: {DEFAULT_ADMIN_USERNAME}")
+    print(f"      密码: {DEFAULT_ADMIN_PASSWORD}")
     print()
     print("   ⚙️ 配置登录要求：")
     print("      - 在 .env 文件中设置 REQUIRE_LOGIN_FOR_ANALYSIS=true")
@@ -11,15 +11,18 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
+# 用户管理器在模块顶部导入一次，避免每个测试函数重复走导入机制
+from web.utils.user_manager import UserManager, get_user_manager
+
 def test_user_manager_initialization():
     """测试UserManager初始化"""
     print("🔍 测试UserManager初始化修复")
     print("=" * 50)
     
     try:
-        # 测试导入
+        # 测试导入（模块顶部已导入，这里仅确认符号可用）
         print("1️⃣ 测试模块导入...")
-        from web.utils.user_manager import UserManager, get_user_manager
+        assert UserManager is not None and get_user_manager is not None
         print("   ✅ 模块导入成功")
         
         # 测试MongoDB适配器导入
@@ -67,11 +70,12 @@ def test_user_manager_initialization():
         default_username = os.getenv("DEFAULT_ADMIN_USERNAME", "admin")
         default_password = os.getenv("DEFAULT_ADMIN_PASSWORD", "Trade123456")
         
-        is_valid, message, user_data = user_manager.authenticate_user(default_username, default_password)
+        # 批量校验接口：一次加载用户数据
+        [is_valid] = user_manager.verify_credentials_batch([(default_username, default_password)])
         if is_valid:
             print(f"   ✅ 默认管理员验证成功")
         else:
-            print(f"   ❌ 默认管理员验证失败: {message}")
+            print(f"   ❌ 默认管理员验证失败")
         
         print("\n🎉 所有测试通过！UserManager初始化问题已修复")
         return True
@@ -91,9 +95,8 @@ def test_authentication_flow():
     print("=" * 50)
     
     try:
-        from web.utils.user_manager import get_user_manager
         from web.components.auth_components import check_authentication
-        
+
         # 检查认证状态
         print("1️⃣ 检查当前认证状态...")
         is_authenticated, username = check_authentication()
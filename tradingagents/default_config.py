@@ -32,6 +32,13 @@ DEFAULT_CONFIG = {
         "collections": {
             "users": "auth_users",
             "sessions": "auth_sessions"
+        },
+        # 连接池参数：min_pool_size预热已认证socket，避免每次rerun的握手开销
+        "pool": {
+            "max_pool_size": 200,
+            "min_pool_size": 10,
+            "max_idle_time_ms": 300000,
+            "wait_queue_timeout_ms": 5000
         }
     },
 
@@ -42,7 +49,8 @@ DEFAULT_CONFIG = {
         "session_expire_hours": 24,
         "min_password_length": 6,
         "require_login_for_analysis": True,  # 默认启用登录要求
-        "password_hash_algorithm": "sha256"
+        "password_hash_algorithm": "bcrypt",  # bcrypt自带盐，旧sha256账户登录时透明升级
+        "bcrypt_cost": 12
     },
 
     # Note: Database and cache configuration is now managed by .env file and config.database_manager
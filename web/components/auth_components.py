@@ -6,49 +6,95 @@
 
 import streamlit as st
 from typing import Dict, Optional
-from web.utils.user_manager import get_user_manager, login_user, logout_user, check_authentication
+from web.utils.user_manager import (
+    get_user_manager,
+    get_current_user_info,
+    login_user,
+    logout_user,
+    check_authentication,
+)
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
 logger = get_logger('web_auth_ui')
 
-def render_login_form() -> Dict:
-    """渲染登录表单"""
-    st.markdown("### 🔐 用户登录")
-    
-    with st.form("login_form"):
-        username = st.text_input("用户名", placeholder="请输入用户名")
-        password = st.text_input("密码", type="password", placeholder="请输入密码")
-        
-        # 只保留登录按钮
-        login_submitted = st.form_submit_button("🚀 登录", use_container_width=True)
-    
-    result = {
-        'action': None,
-        'username': username,
-        'password': password
-    }
-    
-    if login_submitted:
-        if not username or not password:
-            st.error("❌ 请填写完整的登录信息")
-        else:
-            result['action'] = 'login'
-    
-    return result
+# Streamlit ≥1.33提供st.fragment：交互只重跑fragment自身而非整个脚本；
+# 旧版本退化为普通函数调用（整页rerun）
+_fragment = getattr(st, "fragment", None) or (lambda func: func)
+
+
+def _rerun_app():
+    """触发整个应用rerun（fragment内部的st.rerun默认只重跑fragment自身）"""
+    try:
+        st.rerun(scope="app")
+    except TypeError:
+        st.rerun()
+
+
+def render_login_form():
+    """渲染登录表单（fragment作用域：表单交互不触发整页rerun）"""
+
+    @_fragment
+    def _login_fragment():
+        st.markdown("### 🔐 用户登录")
+
+        with st.form("login_form"):
+            # 用户名挂在session_state上：登录失败rerun后不清空，免去重输一轮
+            username = st.text_input("用户名", placeholder="请输入用户名", key="login_username")
+            password = st.text_input("密码", type="password", placeholder="请输入密码")
+
+            # 只保留登录按钮
+            login_submitted = st.form_submit_button("🚀 登录", use_container_width=True)
+
+        if login_submitted:
+            if not username or not password:
+                st.error("❌ 请填写完整的登录信息")
+            else:
+                success, message = login_user(username, password)
+
+                if success:
+                    st.success(message)
+                    st.info("🔄 正在跳转到主页...")
+
+                    # 清除认证页面状态和已登录成功的用户名输入
+                    for key in ('show_auth_page', 'login_username'):
+                        if key in st.session_state:
+                            del st.session_state[key]
+
+                    # 刷新页面
+                    _rerun_app()
+                else:
+                    st.error(message)
+
+    _login_fragment()
+
+
+
 
 
+def _render_anon_sidebar():
+    """渲染未登录状态的侧边栏"""
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### 🔐 请先登录")
 
+    if st.sidebar.button("🚀 立即登录", use_container_width=True):
+        st.session_state['show_auth_page'] = True
+        st.rerun()
 
 
 def render_user_info_sidebar():
     """在侧边栏渲染用户信息"""
+    # 已知未登录时直接走匿名分支，跳过每次rerun的会话校验链路
+    if st.session_state.get('_auth_state') == 'anon':
+        _render_anon_sidebar()
+        return
+
     is_authenticated, username = check_authentication()
-    
+
     if is_authenticated:
-        user_manager = get_user_manager()
-        user_info = user_manager.get_user_info(username)
-        
+        # 登录时已把脱敏用户信息写入session_state，渲染直接复用
+        user_info = get_current_user_info()
+
         if user_info:
             st.sidebar.markdown("---")
             st.sidebar.markdown("### 👤 用户信息")
@@ -61,15 +107,14 @@ def render_user_info_sidebar():
             role_icon = "👑" if role == "admin" else "👤"
             st.sidebar.text(f"{role_icon} {role}")
             
-            # 最后登录时间
-            last_login = user_info.get('last_login')
-            if last_login:
-                from datetime import datetime
-                try:
-                    login_time = datetime.fromisoformat(last_login)
-                    st.sidebar.text(f"🕒 {login_time.strftime('%m-%d %H:%M')}")
-                except:
-                    pass
+            # 最后登录时间（登录时已预格式化，渲染路径不再做fromisoformat解析）
+            last_login_display = user_info.get('last_login_display')
+            if not last_login_display:
+                # 旧数据没有预格式化字段：ISO字符串切片即是"月-日 时:分"
+                last_login = user_info.get('last_login') or ''
+                last_login_display = last_login[5:16].replace('T', ' ')
+            if last_login_display:
+                st.sidebar.text(f"🕒 {last_login_display}")
             
             # 用户操作按钮
             col1, col2 = st.sidebar.columns(2)
@@ -87,12 +132,7 @@ def render_user_info_sidebar():
     
     else:
         # 未登录状态
-        st.sidebar.markdown("---")
-        st.sidebar.markdown("### 🔐 请先登录")
-        
-        if st.sidebar.button("🚀 立即登录", use_container_width=True):
-            st.session_state['show_auth_page'] = True
-            st.rerun()
+        _render_anon_sidebar()
 
 
 def render_auth_page():
@@ -113,26 +153,9 @@ def render_auth_page():
         
         return
     
-    # 渲染登录表单
-    login_result = render_login_form()
-    
-    if login_result['action'] == 'login':
-        # 处理登录
-        success, message = login_user(login_result['username'], login_result['password'])
-        
-        if success:
-            st.success(message)
-            st.info("🔄 正在跳转到主页...")
-            
-            # 清除认证页面状态
-            if 'show_auth_page' in st.session_state:
-                del st.session_state['show_auth_page']
-            
-            # 刷新页面
-            st.rerun()
-        else:
-            st.error(message)
-    
+    # 渲染登录表单（登录处理在fragment内部完成）
+    render_login_form()
+
     # 显示使用条款
     with st.expander("📋 用户协议和隐私政策"):
         st.markdown("""
@@ -184,54 +207,56 @@ def render_user_profile_page():
     st.header("👤 用户资料")
     
     user_manager = get_user_manager()
-    user_info = user_manager.get_user_info(username)
-    
+    user_info = get_current_user_info()
+
     if not user_info:
         st.error("❌ 无法获取用户信息")
         return
     
-    # 创建标签页
-    tab1, tab2, tab3 = st.tabs(["📋 基本信息", "🔐 密码修改", "⚙️ 偏好设置"])
-    
-    with tab1:
+    # 各标签页用fragment隔离：在一个标签页中输入不会重跑其他标签页
+    @_fragment
+    def _render_profile_tab():
         st.subheader("📋 基本信息")
-        
+
         with st.form("profile_form"):
             new_full_name = st.text_input("姓名", value=user_info.get('full_name', ''))
             new_email = st.text_input("邮箱", value=user_info.get('email', ''))
-            
+
             st.markdown("---")
             st.text(f"用户名: {username}")
             st.text(f"注册时间: {user_info.get('created_at', '未知')[:10]}")
             st.text(f"最后登录: {user_info.get('last_login', '未知')[:16]}")
             st.text(f"账户状态: {'✅ 正常' if user_info.get('is_active', True) else '❌ 禁用'}")
-            
+
             profile_submitted = st.form_submit_button("💾 保存修改")
-        
+
         if profile_submitted:
             updates = {
                 'full_name': new_full_name,
                 'email': new_email
             }
-            
+
             success, message = user_manager.update_user_info(username, updates)
-            
+
             if success:
                 st.success(message)
-                st.rerun()
+                # 同步session_state里的副本，避免整页重新加载用户信息
+                st.session_state.get('user_info', user_info).update(updates)
+                _rerun_app()
             else:
                 st.error(message)
-    
-    with tab2:
+
+    @_fragment
+    def _render_password_tab():
         st.subheader("🔐 密码修改")
-        
+
         with st.form("password_form"):
             old_password = st.text_input("当前密码", type="password")
             new_password = st.text_input("新密码", type="password")
             confirm_new_password = st.text_input("确认新密码", type="password")
-            
+
             password_submitted = st.form_submit_button("🔒 修改密码")
-        
+
         if password_submitted:
             if not old_password or not new_password:
                 st.error("❌ 请填写完整的密码信息")
@@ -239,54 +264,68 @@ def render_user_profile_page():
                 st.error("❌ 两次输入的新密码不一致")
             else:
                 success, message = user_manager.change_password(username, old_password, new_password)
-                
+
                 if success:
                     st.success(message)
                     st.info("🔄 请重新登录以确保安全")
                 else:
                     st.error(message)
-    
-    with tab3:
+
+    @_fragment
+    def _render_preferences_tab():
         st.subheader("⚙️ 偏好设置")
-        
+
         preferences = user_info.get('preferences', {})
-        
+
         with st.form("preferences_form"):
             default_market = st.selectbox(
                 "默认市场",
                 options=["A股", "美股", "港股"],
                 index=["A股", "美股", "港股"].index(preferences.get('default_market', 'A股'))
             )
-            
+
             auto_refresh = st.checkbox(
                 "自动刷新分析进度",
                 value=preferences.get('auto_refresh', True)
             )
-            
+
             theme = st.selectbox(
                 "界面主题",
                 options=["default", "dark", "light"],
                 index=["default", "dark", "light"].index(preferences.get('theme', 'default'))
             )
-            
+
             preferences_submitted = st.form_submit_button("💾 保存偏好")
-        
+
         if preferences_submitted:
             new_preferences = {
                 'default_market': default_market,
                 'auto_refresh': auto_refresh,
                 'theme': theme
             }
-            
+
             updates = {'preferences': new_preferences}
             success, message = user_manager.update_user_info(username, updates)
-            
+
             if success:
                 st.success(message)
-                st.rerun()
+                st.session_state.get('user_info', user_info).update(updates)
+                _rerun_app()
             else:
                 st.error(message)
-    
+
+    # 创建标签页
+    tab1, tab2, tab3 = st.tabs(["📋 基本信息", "🔐 密码修改", "⚙️ 偏好设置"])
+
+    with tab1:
+        _render_profile_tab()
+
+    with tab2:
+        _render_password_tab()
+
+    with tab3:
+        _render_preferences_tab()
+
     # 返回按钮
     if st.button("🔙 返回主页"):
         if 'show_user_profile' in st.session_state:
@@ -1,6 +1,9 @@
 # Web工具模块
 
-# 导入用户管理器
+import importlib
+import importlib.util
+
+# 用户管理器是热路径（每次rerun都要做会话校验），保持即时导入
 from .user_manager import (
     UserManager,
     get_user_manager,
@@ -9,30 +12,59 @@ from .user_manager import (
     check_authentication
 )
 
-# 导入MongoDB认证适配器
-try:
-    from .mongodb_auth_adapter import (
-        MongoDBAuthAdapter,
-        get_mongodb_auth_adapter
-    )
-    MONGODB_AUTH_AVAILABLE = True
-except ImportError:
-    MONGODB_AUTH_AVAILABLE = False
-
-# 导入其他工具模块
-from .analysis_runner import *
-from .api_checker import *
-from .async_progress_tracker import *
-from .progress_tracker import *
+# MongoDB认证是否可用只看pymongo是否安装，无需真正导入适配器
+MONGODB_AUTH_AVAILABLE = importlib.util.find_spec("pymongo") is not None
+
+# 其余子模块按PEP 562延迟导入：mongodb_auth_adapter会连带加载pymongo/bson，
+# 分析工具模块会加载整个分析依赖图，不触碰这些功能的页面无需付这笔导入开销。
+# 显式枚举各模块的公开名字（代替原先的 import *），未知名字直接AttributeError
+_LAZY_ATTR_MODULES = {
+    'MongoDBAuthAdapter': '.mongodb_auth_adapter',
+    'get_mongodb_auth_adapter': '.mongodb_auth_adapter',
+    # analysis_runner
+    'run_stock_analysis': '.analysis_runner',
+    'format_analysis_results': '.analysis_runner',
+    'validate_analysis_params': '.analysis_runner',
+    'translate_analyst_labels': '.analysis_runner',
+    'extract_risk_assessment': '.analysis_runner',
+    'get_supported_stocks': '.analysis_runner',
+    'generate_demo_results': '.analysis_runner',
+    # api_checker
+    'check_api_keys': '.api_checker',
+    'get_api_key_status_message': '.api_checker',
+    'validate_api_key_format': '.api_checker',
+    'test_api_connection': '.api_checker',
+    # async_progress_tracker
+    'AsyncProgressTracker': '.async_progress_tracker',
+    'safe_serialize': '.async_progress_tracker',
+    'get_progress_by_id': '.async_progress_tracker',
+    'get_latest_analysis_id': '.async_progress_tracker',
+    'format_time': '.async_progress_tracker',
+    # progress_tracker
+    'SmartAnalysisProgressTracker': '.progress_tracker',
+    'SmartStreamlitProgressDisplay': '.progress_tracker',
+    'create_smart_progress_callback': '.progress_tracker',
+    'create_progress_callback': '.progress_tracker',
+}
 
 __all__ = [
     'UserManager',
-    'get_user_manager', 
+    'get_user_manager',
     'login_user',
     'logout_user',
     'check_authentication',
-    'MONGODB_AUTH_AVAILABLE'
+    'MONGODB_AUTH_AVAILABLE',
+    *_LAZY_ATTR_MODULES,
 ]
 
-if MONGODB_AUTH_AVAILABLE:
-    __all__.extend(['MongoDBAuthAdapter', 'get_mongodb_auth_adapter'])
\ No newline at end of file
+
+def __getattr__(name):
+    """按需导入子模块的名字，并缓存到模块命名空间避免重复查找"""
+    module_name = _LAZY_ATTR_MODULES.get(name)
+    if module_name:
+        module = importlib.import_module(module_name, __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,8 +4,11 @@ MongoDB用户认证适配器
 处理用户数据和会话数据的MongoDB存储
 """
 
+import base64
 import os
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Any
 from dataclasses import asdict
 
@@ -13,15 +16,77 @@ from dataclasses import asdict
 from tradingagents.utils.logging_manager import get_logger
 logger = get_logger('web_auth_mongodb')
 
+from tradingagents.default_config import DEFAULT_CONFIG
+
 try:
-    from pymongo import MongoClient
-    from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError, DuplicateKeyError
+    from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient
+    from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError, DuplicateKeyError, OperationFailure
+    from bson import Binary
     MONGODB_AVAILABLE = True
 except ImportError:
     MONGODB_AVAILABLE = False
     MongoClient = None
 
 
+# 会话文档中需要在ISO字符串和BSON原生datetime之间转换的字段
+_SESSION_DATETIME_FIELDS = ("created_at", "expires_at", "last_activity")
+
+
+def _token_to_key(token: str):
+    """把token_urlsafe生成的base64url令牌还原为原始字节作为存储键
+
+    BSON Binary键比43字符的字符串短约一半，唯一索引的存储和键比较
+    开销随之减半；无法解码的历史令牌原样以字符串存储。
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except (ValueError, TypeError):
+        return token
+    return Binary(raw)
+
+
+def _key_to_token(key) -> str:
+    """存储键转回应用侧的base64url令牌字符串"""
+    if isinstance(key, (Binary, bytes)):
+        return base64.urlsafe_b64encode(bytes(key)).rstrip(b'=').decode('ascii')
+    return key
+
+
+def _session_to_doc(session_data: Dict[str, Any]) -> Dict[str, Any]:
+    """会话入库前把ISO时间字符串转为BSON原生datetime（TTL索引的前提）
+
+    入库侧只读不改调用方的dict：无需转换时直接返回原dict，
+    避免每次会话写入都分配一份浅拷贝。
+    """
+    # fromisoformat得到的本地时间统一转为带时区的UTC入库，
+    # 避免不同时区的worker写出互相不可比的时间值
+    converted = {
+        field: datetime.fromisoformat(value).astimezone(timezone.utc)
+        for field in _SESSION_DATETIME_FIELDS
+        if isinstance(value := session_data.get(field), str)
+    }
+    token = session_data.get('token')
+    if isinstance(token, str):
+        key = _token_to_key(token)
+        if key is not token:
+            converted['token'] = key
+    if not converted:
+        return session_data
+    return {**session_data, **converted}
+
+
+def _doc_to_session(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """会话出库时转回ISO字符串和base64url令牌，保持user_manager侧的格式不变"""
+    for field in _SESSION_DATETIME_FIELDS:
+        value = doc.get(field)
+        if isinstance(value, datetime):
+            # UTC转回本地时间的朴素ISO字符串，与user_manager的datetime.now()格式一致
+            doc[field] = value.astimezone().replace(tzinfo=None).isoformat()
+    if 'token' in doc:
+        doc['token'] = _key_to_token(doc['token'])
+    return doc
+
+
 class MongoDBAuthAdapter:
     """MongoDB用户认证适配器"""
     
@@ -44,7 +109,13 @@ class MongoDBAuthAdapter:
         self.users_collection = None
         self.sessions_collection = None
         self._connected = False
-        
+
+        # 会话查询的短TTL内存缓存：token -> (session_data, cached_at)
+        # Streamlit每次交互都会触发会话校验，缓存让热路径绕过Mongo查询
+        self._session_cache: Dict[str, tuple] = {}
+        self._session_cache_ttl = 30  # 秒
+        self._session_cache_max = 4096
+
         # 尝试连接
         self._connect()
     
@@ -71,9 +142,17 @@ class MongoDBAuthAdapter:
     def _connect(self):
         """连接到MongoDB"""
         try:
+            # 连接池参数来自默认配置，便于运维按部署规模调整
+            pool_config = DEFAULT_CONFIG.get("mongodb_auth", {}).get("pool", {})
             self.client = MongoClient(
                 self.connection_string,
-                serverSelectionTimeoutMS=5000  # 5秒超时
+                serverSelectionTimeoutMS=5000,  # 5秒超时
+                maxPoolSize=pool_config.get("max_pool_size", 200),
+                minPoolSize=pool_config.get("min_pool_size", 10),
+                maxIdleTimeMS=pool_config.get("max_idle_time_ms", 300000),
+                waitQueueTimeoutMS=pool_config.get("wait_queue_timeout_ms", 5000),
+                retryWrites=True,
+                tz_aware=True  # 出库datetime带UTC时区，与入库的tz-aware值对称
             )
             
             # 测试连接
@@ -97,26 +176,70 @@ class MongoDBAuthAdapter:
             logger.error(f"❌ MongoDB认证适配器初始化失败: {e}")
             self._connected = False
     
+    # 索引每个进程只需创建一次（幂等操作，但每次create_index都是一个网络往返）
+    _indexes_built = False
+    # 单机MongoDB不支持事务：首次OperationFailure后记住结论，
+    # 后续delete_user不再每次白付一趟注定失败的事务往返
+    _transactions_unsupported = False
+
     def _create_indexes(self):
-        """创建数据库索引"""
+        """创建数据库索引（批量提交，每个进程至多执行一次）"""
+        if self.__class__._indexes_built:
+            return
+
         try:
             # 用户集合索引
-            self.users_collection.create_index("username", unique=True)  # 用户名唯一索引
-            self.users_collection.create_index("email", unique=True)     # 邮箱唯一索引
-            self.users_collection.create_index("created_at")             # 创建时间索引
-            self.users_collection.create_index("last_login")             # 最后登录时间索引
-            self.users_collection.create_index("is_active")              # 活跃状态索引
-            
+            user_indexes = [
+                IndexModel([("username", ASCENDING)], unique=True),  # 用户名唯一索引
+                IndexModel([("email", ASCENDING)], unique=True),     # 邮箱唯一索引
+                IndexModel([("created_at", ASCENDING)]),             # 创建时间索引
+                IndexModel([("last_login", ASCENDING)]),             # 最后登录时间索引
+                IndexModel([("is_active", ASCENDING)]),              # 活跃状态索引
+            ]
+
             # 会话集合索引
-            self.sessions_collection.create_index("token", unique=True)   # 令牌唯一索引
-            self.sessions_collection.create_index("username")             # 用户名索引
-            self.sessions_collection.create_index("expires_at")           # 过期时间索引
-            self.sessions_collection.create_index("created_at")           # 创建时间索引
-            
+            session_indexes = [
+                IndexModel([("token", ASCENDING)], unique=True),     # 令牌唯一索引
+                # 复合索引：username前缀覆盖按用户查询，加expires_at支持
+                # "某用户的活跃会话"一次seek完成，无需索引交集
+                IndexModel([("username", ASCENDING), ("expires_at", DESCENDING)]),
+                # TTL索引：expires_at一到，MongoDB后台自动删除过期会话
+                # （TTL要求单字段索引，不能并入上面的复合索引）
+                IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+                IndexModel([("created_at", ASCENDING)]),             # 创建时间索引
+            ]
+
+            self.users_collection.create_indexes(user_indexes)
+
+            try:
+                self.sessions_collection.create_indexes(session_indexes)
+            except OperationFailure as e:
+                # 升级库里已有基线创建的普通expires_at_1索引，与TTL选项
+                # 同名冲突(IndexOptionsConflict, code 85)：删掉旧索引后重建
+                if e.code != 85:
+                    raise
+                self.sessions_collection.drop_index("expires_at_1")
+                logger.info("🧹 已删除与TTL冲突的旧expires_at索引")
+                self.sessions_collection.create_indexes(session_indexes)
+
+            self.__class__._indexes_built = True
             logger.info(f"✅ MongoDB认证索引创建完成")
-            
+
         except Exception as e:
             logger.error(f"⚠️ MongoDB认证索引创建失败: {e}")
+
+        # 一次性清理升级前遗留的字符串expires_at会话文档：TTL索引和
+        # 过期查询只认BSON datetime，字符串文档会永远滞留且无法读取
+        # （token查找已改为Binary键），用户重新登录即可重建会话。
+        # 独立于索引创建执行，索引失败也不影响清理
+        try:
+            legacy = self.sessions_collection.delete_many(
+                {"expires_at": {"$type": "string"}}
+            )
+            if legacy.deleted_count:
+                logger.info(f"🧹 清理了 {legacy.deleted_count} 个遗留的字符串时间会话")
+        except Exception as e:
+            logger.error(f"❌ 清理遗留会话文档失败: {e}")
     
     def is_connected(self) -> bool:
         """检查是否连接到MongoDB"""
@@ -128,18 +251,18 @@ class MongoDBAuthAdapter:
             return False
         
         try:
-            # 添加MongoDB特有字段
-            user_doc = user_data.copy()
-            user_doc['_created_at'] = datetime.now()
-            user_doc['_updated_at'] = datetime.now()
-            
-            # 插入或更新用户
-            result = self.users_collection.replace_one(
+            # 更新时间戳由$currentDate在服务端盖章，省去Python侧的datetime.now()
+            # 和一次序列化；_created_at仅在首次插入时写入
+            result = self.users_collection.update_one(
                 {"username": user_data["username"]},
-                user_doc,
+                {
+                    "$set": user_data,
+                    "$setOnInsert": {"_created_at": datetime.now(timezone.utc)},
+                    "$currentDate": {"_updated_at": True},
+                },
                 upsert=True
             )
-            
+
             if result.upserted_id or result.modified_count > 0:
                 logger.info(f"👤 用户数据已保存到MongoDB: {user_data['username']}")
                 return True
@@ -160,41 +283,58 @@ class MongoDBAuthAdapter:
             return None
         
         try:
-            user_doc = self.users_collection.find_one({"username": username})
-            
+            # MongoDB特有字段由投影在服务端剔除
+            user_doc = self.users_collection.find_one(
+                {"username": username},
+                projection={"_id": 0, "_created_at": 0, "_updated_at": 0}
+            )
+
             if user_doc:
-                # 移除MongoDB特有字段
-                user_doc.pop('_id', None)
-                user_doc.pop('_created_at', None)
-                user_doc.pop('_updated_at', None)
-                
                 return user_doc
-            
+
             return None
             
         except Exception as e:
             logger.error(f"❌ 从MongoDB加载用户失败: {e}")
             return None
     
+    def load_user_for_auth(self, username: str) -> Optional[Dict[str, Any]]:
+        """只加载登录校验所需的字段
+
+        登录热路径不需要preferences、email等大字段，窄投影省去它们的
+        网络传输和BSON解码；校验通过后再用load_user取完整文档。
+        """
+        if not self._connected:
+            return None
+
+        try:
+            return self.users_collection.find_one(
+                {"username": username},
+                projection={"_id": 0, "password_hash": 1, "is_active": 1, "role": 1}
+            )
+        except Exception as e:
+            logger.error(f"❌ 从MongoDB加载用户认证信息失败: {e}")
+            return None
+
     def load_all_users(self) -> Dict[str, Dict[str, Any]]:
         """加载所有用户数据"""
         if not self._connected:
             return {}
         
         try:
-            cursor = self.users_collection.find({})
+            # MongoDB特有字段由投影在服务端剔除，减少网络字节和Python侧的dict整理
+            cursor = self.users_collection.find(
+                {},
+                projection={"_id": 0, "_created_at": 0, "_updated_at": 0},
+                batch_size=500
+            )
             users = {}
-            
+
             for user_doc in cursor:
-                # 移除MongoDB特有字段
-                user_doc.pop('_id', None)
-                user_doc.pop('_created_at', None)
-                user_doc.pop('_updated_at', None)
-                
                 username = user_doc.get('username')
                 if username:
                     users[username] = user_doc
-            
+
             return users
             
         except Exception as e:
@@ -207,13 +347,10 @@ class MongoDBAuthAdapter:
             return False
         
         try:
-            # 添加更新时间
-            updates_with_timestamp = updates.copy()
-            updates_with_timestamp['_updated_at'] = datetime.now()
-            
+            # 更新时间戳由$currentDate在服务端盖章
             result = self.users_collection.update_one(
                 {"username": username},
-                {"$set": updates_with_timestamp}
+                {"$set": updates, "$currentDate": {"_updated_at": True}}
             )
             
             if result.modified_count > 0:
@@ -233,12 +370,31 @@ class MongoDBAuthAdapter:
             return False
         
         try:
-            # 删除用户
-            user_result = self.users_collection.delete_one({"username": username})
-            
-            # 删除用户的所有会话
-            session_result = self.sessions_collection.delete_many({"username": username})
-            
+            # 失效该用户的所有缓存会话
+            for cached_token, (session_data, _) in list(self._session_cache.items()):
+                if session_data.get('username') == username:
+                    self._session_cache.pop(cached_token, None)
+
+            user_result = None
+            if not self.__class__._transactions_unsupported:
+                try:
+                    # 副本集环境：用户删除和会话删除在同一事务中一次性提交
+                    with self.client.start_session() as mongo_session:
+                        def _delete_both(s):
+                            return (
+                                self.users_collection.delete_one({"username": username}, session=s),
+                                self.sessions_collection.delete_many({"username": username}, session=s),
+                            )
+                        user_result, session_result = mongo_session.with_transaction(_delete_both)
+                except OperationFailure:
+                    self.__class__._transactions_unsupported = True
+                    logger.info("📄 MongoDB不支持事务（单机部署），后续删除改走顺序路径")
+
+            if user_result is None:
+                # 无事务支持时顺序执行两个删除
+                user_result = self.users_collection.delete_one({"username": username})
+                session_result = self.sessions_collection.delete_many({"username": username})
+
             if user_result.deleted_count > 0:
                 logger.info(f"🗑️ 用户已删除: {username} (同时删除了{session_result.deleted_count}个会话)")
                 return True
@@ -256,14 +412,22 @@ class MongoDBAuthAdapter:
             return False
         
         try:
-            # 添加MongoDB特有字段
-            session_doc = session_data.copy()
-            session_doc['_created_at'] = datetime.now()
-            
-            # 插入会话
-            result = self.sessions_collection.insert_one(session_doc)
-            
-            if result.inserted_id:
+            # 写入前失效对应的缓存条目
+            self._session_cache.pop(session_data.get('token'), None)
+
+            # 时间字段转为原生datetime以支持TTL和范围查询；upsert使同一token的
+            # 会话更新（如last_activity刷新）也能走这条路径而不撞唯一索引
+            session_doc = _session_to_doc(session_data)
+            result = self.sessions_collection.update_one(
+                {"token": session_doc["token"]},
+                {
+                    "$set": session_doc,
+                    "$setOnInsert": {"_created_at": datetime.now(timezone.utc)},
+                },
+                upsert=True
+            )
+
+            if result.upserted_id or result.matched_count > 0:
                 logger.info(f"🔑 会话已保存到MongoDB: {session_data.get('token', 'unknown')[:8]}...")
                 return True
             else:
@@ -274,23 +438,68 @@ class MongoDBAuthAdapter:
             logger.error(f"❌ 保存会话到MongoDB失败: {e}")
             return False
     
+    def replace_user_session(self, username: str, session_data: Dict[str, Any]) -> bool:
+        """用新会话替换用户的现有会话（单次网络往返）
+
+        create_session原先是delete_user_sessions + save_session两次往返；
+        每用户只保留一个会话，按username一次find_one_and_replace即可。
+        残留的历史多会话文档由TTL索引在后台回收。
+        """
+        if not self._connected:
+            return False
+
+        try:
+            # 失效该用户的所有缓存会话
+            for cached_token, (cached_data, _) in list(self._session_cache.items()):
+                if cached_data.get('username') == username:
+                    self._session_cache.pop(cached_token, None)
+
+            session_doc = _session_to_doc(session_data)
+            self.sessions_collection.find_one_and_replace(
+                {"username": username},
+                session_doc,
+                upsert=True
+            )
+
+            logger.info(f"🔑 会话已替换到MongoDB: {session_data.get('token', 'unknown')[:8]}...")
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ 替换会话到MongoDB失败: {e}")
+            return False
+
     def load_session(self, token: str) -> Optional[Dict[str, Any]]:
         """加载会话数据"""
         if not self._connected:
             return None
-        
+
         try:
-            session_doc = self.sessions_collection.find_one({"token": token})
-            
+            # 先查内存缓存；命中时重查过期时间，避免返回已过期的会话
+            cached = self._session_cache.get(token)
+            if cached:
+                session_data, cached_at = cached
+                if (time.monotonic() - cached_at < self._session_cache_ttl
+                        and session_data.get('expires_at', '') > datetime.now().isoformat()):
+                    return dict(session_data)
+                self._session_cache.pop(token, None)
+
+            # MongoDB特有字段由投影在服务端剔除
+            session_doc = self.sessions_collection.find_one(
+                {"token": _token_to_key(token)},
+                projection={"_id": 0, "_created_at": 0}
+            )
+
             if session_doc:
-                # 移除MongoDB特有字段
-                session_doc.pop('_id', None)
-                session_doc.pop('_created_at', None)
-                
-                return session_doc
-            
+                session_data = _doc_to_session(session_doc)
+
+                if len(self._session_cache) >= self._session_cache_max:
+                    self._session_cache.clear()
+                self._session_cache[token] = (dict(session_data), time.monotonic())
+
+                return session_data
+
             return None
-            
+
         except Exception as e:
             logger.error(f"❌ 从MongoDB加载会话失败: {e}")
             return None
@@ -301,17 +510,18 @@ class MongoDBAuthAdapter:
             return {}
         
         try:
-            cursor = self.sessions_collection.find({})
+            # MongoDB特有字段由投影在服务端剔除
+            cursor = self.sessions_collection.find(
+                {},
+                projection={"_id": 0, "_created_at": 0},
+                batch_size=500
+            )
             sessions = {}
-            
+
             for session_doc in cursor:
-                # 移除MongoDB特有字段
-                session_doc.pop('_id', None)
-                session_doc.pop('_created_at', None)
-                
                 token = session_doc.get('token')
                 if token:
-                    sessions[token] = session_doc
+                    sessions[token] = _doc_to_session(session_doc)
             
             return sessions
             
@@ -325,7 +535,9 @@ class MongoDBAuthAdapter:
             return False
         
         try:
-            result = self.sessions_collection.delete_one({"token": token})
+            self._session_cache.pop(token, None)
+
+            result = self.sessions_collection.delete_one({"token": _token_to_key(token)})
             
             if result.deleted_count > 0:
                 logger.info(f"🔑 会话已删除: {token[:8]}...")
@@ -344,8 +556,13 @@ class MongoDBAuthAdapter:
             return 0
         
         try:
+            # 失效该用户的所有缓存会话
+            for cached_token, (session_data, _) in list(self._session_cache.items()):
+                if session_data.get('username') == username:
+                    self._session_cache.pop(cached_token, None)
+
             result = self.sessions_collection.delete_many({"username": username})
-            
+
             deleted_count = result.deleted_count
             if deleted_count > 0:
                 logger.info(f"🔑 删除了用户 {username} 的 {deleted_count} 个会话")
@@ -362,18 +579,16 @@ class MongoDBAuthAdapter:
             return 0
         
         try:
-            current_time = datetime.now()
-            
-            result = self.sessions_collection.delete_many({
-                "expires_at": {"$lt": current_time.isoformat()}
+            # TTL索引会在后台自动删除过期会话；这里只统计尚未被回收的数量
+            expired_count = self.sessions_collection.count_documents({
+                "expires_at": {"$lt": datetime.now(timezone.utc)}
             })
-            
-            deleted_count = result.deleted_count
-            if deleted_count > 0:
-                logger.info(f"🧹 清理了 {deleted_count} 个过期会话")
-            
-            return deleted_count
-            
+
+            if expired_count > 0:
+                logger.info(f"🧹 {expired_count} 个过期会话等待TTL索引回收")
+
+            return expired_count
+
         except Exception as e:
             logger.error(f"❌ 清理过期会话失败: {e}")
             return 0
@@ -387,9 +602,9 @@ class MongoDBAuthAdapter:
             total_users = self.users_collection.count_documents({})
             total_sessions = self.sessions_collection.count_documents({})
             
-            current_time = datetime.now()
+            # 原生datetime比较，走expires_at索引的B树范围扫描
             active_sessions = self.sessions_collection.count_documents({
-                "expires_at": {"$gte": current_time.isoformat()}
+                "expires_at": {"$gte": datetime.now(timezone.utc)}
             })
             
             return {
@@ -410,15 +625,37 @@ class MongoDBAuthAdapter:
             logger.info(f"MongoDB认证适配器连接已关闭")
 
 
+# 进程级单例：整个worker共享一个MongoClient及其连接池
+_adapter_lock = threading.Lock()
+_adapter: Optional[MongoDBAuthAdapter] = None
+_adapter_initialized = False
+
+
 def get_mongodb_auth_adapter() -> Optional[MongoDBAuthAdapter]:
-    """获取MongoDB认证适配器实例"""
-    try:
-        adapter = MongoDBAuthAdapter()
-        if adapter.is_connected():
-            return adapter
-        else:
-            logger.warning("⚠️ MongoDB认证适配器连接失败")
-            return None
-    except Exception as e:
-        logger.error(f"❌ 创建MongoDB认证适配器失败: {e}")
-        return None 
\ No newline at end of file
+    """获取MongoDB认证适配器实例
+
+    进程级单例：Streamlit每次交互都会重跑整个脚本，适配器及其连接池
+    必须跨rerun复用，避免每次交互重复ping和建索引。
+    """
+    global _adapter, _adapter_initialized
+
+    if _adapter_initialized:
+        return _adapter
+
+    with _adapter_lock:
+        if _adapter_initialized:
+            return _adapter
+
+        try:
+            adapter = MongoDBAuthAdapter()
+            if adapter.is_connected():
+                _adapter = adapter
+            else:
+                logger.warning("⚠️ MongoDB认证适配器连接失败")
+                _adapter = None
+        except Exception as e:
+            logger.error(f"❌ 创建MongoDB认证适配器失败: {e}")
+            _adapter = None
+
+        _adapter_initialized = True
+        return _adapter 
\ No newline at end of file
@@ -4,10 +4,15 @@
 处理用户注册、登录、会话管理等功能
 """
 
+import copy
 import hashlib
+import hmac
 import json
 import os
+import re
 import secrets
+import sqlite3
+import threading
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -18,19 +23,60 @@ import streamlit as st
 from tradingagents.utils.logging_manager import get_logger
 logger = get_logger('web_auth')
 
-# 导入MongoDB认证适配器
+from tradingagents.default_config import DEFAULT_CONFIG
+
+# 可选的bcrypt密码哈希库（缺失时回退到SHA-256遗留算法）
+try:
+    import bcrypt
+    BCRYPT_AVAILABLE = True
+except ImportError:
+    BCRYPT_AVAILABLE = False
+    bcrypt = None
+
+# 可选的高性能JSON库（缺失时回退到标准库json）
 try:
-    from .mongodb_auth_adapter import get_mongodb_auth_adapter, MongoDBAuthAdapter
-    MONGODB_AUTH_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    MONGODB_AUTH_AVAILABLE = False
-    get_mongodb_auth_adapter = None
-    MongoDBAuthAdapter = None
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+
+def _read_json_file(path: Path) -> Dict:
+    """读取JSON文件，优先使用orjson解析"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(path.read_bytes())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json_file_atomic(path: Path, data: Dict):
+    """原子写入JSON文件
+
+    先写临时文件再os.replace替换，避免并发写入时产生半截文件。
+    """
+    if ORJSON_AVAILABLE:
+        # OPT_NON_STR_KEYS使非字符串键与标准库json一样被转成字符串而非抛错
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        payload = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+
+# MongoDB认证适配器可用性检测：只探测pymongo是否安装，
+# 适配器模块本身延迟到真正初始化时再导入
+import importlib.util
+MONGODB_AUTH_AVAILABLE = importlib.util.find_spec("pymongo") is not None
+
+# 邮箱格式校验正则（模块加载时编译一次）
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
 
 class UserManager:
     """用户管理器"""
     
-    def __init__(self, users_file: str = "web/data/users.json", sessions_file: str = "web/data/sessions.json"):
+    def __init__(self, users_file: str = "web/data/users.json", sessions_file: str = "web/data/sessions.sqlite"):
         """初始化用户管理器"""
         self.users_file = Path(users_file)
         self.sessions_file = Path(sessions_file)
@@ -41,10 +87,45 @@ class UserManager:
         
         # 会话过期时间（默认24小时）
         self.session_expire_hours = 24
+
+        # last_activity写入节流间隔（秒）：Streamlit每次交互都会校验会话，
+        # 间隔内的重复校验不再落盘
+        self.activity_update_interval = 60
         
         # 密码复杂度要求
         self.min_password_length = 6
-        
+
+        # MongoDB为权威存储时默认跳过本地镜像写入（双写让热路径多一倍磁盘IO）；
+        # 需要本地备份时用环境变量开启
+        self.json_mirror = os.getenv('TRADINGAGENTS_JSON_MIRROR', '0') == '1'
+
+        # 密码哈希算法配置（bcrypt不可用时自动回退SHA-256）
+        auth_config = DEFAULT_CONFIG.get("user_auth", {})
+        self.password_hash_algorithm = auth_config.get("password_hash_algorithm", "bcrypt")
+        self.bcrypt_cost = auth_config.get("bcrypt_cost", 12)
+
+        # 用户/会话文件内存缓存（按mtime+size失效，避免重复读取+解析JSON）；
+        # 锁用于合并并发Streamlit会话的加载请求，只做一次真实读取
+        self._users_cache = None
+        self._users_cache_key = None
+        self._users_lock = threading.Lock()
+
+        # 会话改用SQLite存储：单行读写O(1)，不再整文件重写
+        self._sessions_db = None
+        self._sessions_lock = threading.Lock()
+
+        # bcrypt校验结果记忆化：(口令摘要, 存储哈希) -> bool
+        self._verify_cache: Dict[tuple, bool] = {}
+        self._verify_cache_max = 512
+
+        # email -> username反向索引，替代注册/改邮箱时的全量线性扫描
+        self._email_index: Optional[Dict[str, str]] = None
+
+        # 预脱敏用户视图：与users缓存同版本一次性构建，
+        # get_user_info不再对每次调用做copy+pop
+        self._public_users: Optional[Dict[str, Dict]] = None
+        self._public_users_key = None
+
         # 先初始化MongoDB适配器
         self.mongodb_adapter = None
         self._init_mongodb_adapter()
@@ -52,21 +133,87 @@ class UserManager:
         # 然后初始化文件（可能会用到mongodb_adapter）
         self._init_files()
         
-        # 最后创建默认管理员账户
-        self._create_default_admin()
-        
+        # 默认管理员延迟到首次登录时创建：__init__在首个页面渲染时同步执行，
+        # 这里不再多付一次用户查询+可能的bcrypt注册开销
+        self._bootstrap_done = False
+        self._bootstrap_lock = threading.Lock()
+
+        # 后台周期清理过期会话，validate_session里的惰性过期仍作为兜底
+        self._start_session_sweeper()
+
         logger.info("✅ 用户管理器初始化完成")
     
+    # 会话表字段，与会话字典的键一一对应
+    _SESSION_COLUMNS = ('token', 'username', 'created_at', 'expires_at', 'last_activity')
+
     def _init_files(self):
-        """初始化用户和会话文件"""
+        """初始化用户文件和会话数据库"""
         if not self.users_file.exists():
             self._save_users({})
             logger.info(f"📄 创建用户文件: {self.users_file}")
-        
-        if not self.sessions_file.exists():
-            self._save_sessions({})
-            logger.info(f"📄 创建会话文件: {self.sessions_file}")
+
+        self._init_sessions_db()
+
+    def _init_sessions_db(self):
+        """初始化SQLite会话库，并迁移遗留的sessions.json数据
+
+        create/validate/destroy每次只涉及一个会话，JSON整文件重写是
+        O(N)写放大；SQLite按token主键单行读写，WAL模式下读写互不阻塞。
+        """
+        first_init = not self.sessions_file.exists()
+
+        self._sessions_db = sqlite3.connect(str(self.sessions_file), check_same_thread=False)
+        self._sessions_db.execute("PRAGMA journal_mode=WAL")
+        self._sessions_db.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                token TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                created_at TEXT,
+                expires_at TEXT,
+                last_activity TEXT
+            )"""
+        )
+        self._sessions_db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sessions_username_expires"
+            " ON sessions(username, expires_at)"
+        )
+        self._sessions_db.commit()
+
+        if first_init:
+            logger.info(f"📄 创建会话数据库: {self.sessions_file}")
+
+        # 一次性迁移遗留的JSON会话文件
+        legacy_file = self.sessions_file.with_suffix('.json')
+        if legacy_file.exists():
+            try:
+                legacy_sessions = _read_json_file(legacy_file)
+                if legacy_sessions:
+                    self._save_sessions(legacy_sessions)
+                legacy_file.rename(legacy_file.with_name(legacy_file.name + '.bak'))
+                logger.info(f"📄 已迁移 {len(legacy_sessions)} 个遗留会话到SQLite")
+            except Exception as e:
+                logger.error(f"❌ 迁移遗留会话文件失败: {e}")
     
+    def _start_session_sweeper(self):
+        """启动后台会话清理线程
+
+        daemon线程随进程退出；get_user_manager的进程级单例保证每个
+        worker只有一个清理线程。间隔可通过环境变量调整，设为0禁用。
+        """
+        interval = int(os.getenv("SESSION_SWEEP_INTERVAL_SECS", "60"))
+        if interval <= 0:
+            return
+
+        def _sweep_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.cleanup_expired_sessions()
+                except Exception as e:
+                    logger.error(f"❌ 后台会话清理失败: {e}")
+
+        threading.Thread(target=_sweep_loop, name="session-sweeper", daemon=True).start()
+
     def _init_mongodb_adapter(self):
         """初始化MongoDB适配器"""
         if not MONGODB_AUTH_AVAILABLE:
@@ -75,8 +222,13 @@ class UserManager:
             return
         
         try:
+            # 延迟导入：确认pymongo存在后才加载适配器模块
+            from .mongodb_auth_adapter import get_mongodb_auth_adapter
             self.mongodb_adapter = get_mongodb_auth_adapter()
             if self.mongodb_adapter:
+                # 预热查询：促使PyMongo提前建立并认证minPoolSize个socket，
+                # 首次真实登录不再付TCP+认证握手的尾延迟
+                self.mongodb_adapter.load_user('__warmup__')
                 logger.info("✅ MongoDB认证适配器初始化成功")
             else:
                 logger.warning("⚠️ MongoDB认证适配器连接失败，将使用JSON文件存储")
@@ -84,6 +236,18 @@ class UserManager:
             logger.error(f"❌ MongoDB认证适配器初始化失败: {e}")
             self.mongodb_adapter = None
     
+    def _ensure_default_admin(self):
+        """确保默认管理员已创建（进程内至多执行一次）"""
+        if self._bootstrap_done:
+            return
+        with self._bootstrap_lock:
+            if self._bootstrap_done:
+                return
+            try:
+                self._create_default_admin()
+            finally:
+                self._bootstrap_done = True
+
     def _create_default_admin(self):
         """创建默认管理员账户"""
         default_username = os.getenv("DEFAULT_ADMIN_USERNAME", "admin")
@@ -141,12 +305,43 @@ class UserManager:
         
         # 降级到JSON文件
         try:
-            with open(self.users_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            # 文件未变化时直接命中内存缓存，省掉一次读取+解析（stat只要微秒级）
+            file_stat = self.users_file.stat()
+            cache_key = (file_stat.st_mtime_ns, file_stat.st_size)
+            if self._users_cache is not None and cache_key == self._users_cache_key:
+                return copy.deepcopy(self._users_cache)
+
+            with self._users_lock:
+                # 双重检查：等锁期间其他线程可能已完成加载
+                if self._users_cache is not None and cache_key == self._users_cache_key:
+                    return copy.deepcopy(self._users_cache)
+
+                users = _read_json_file(self.users_file)
+
+                self._users_cache = users
+                self._users_cache_key = cache_key
+            return copy.deepcopy(users)
         except Exception as e:
             logger.error(f"❌ 加载用户文件失败: {e}")
             return {}
     
+    def _load_single_user(self, username: str) -> Optional[Dict]:
+        """按用户名加载单个用户
+
+        MongoDB模式下按username索引取单文档，避免为查一个用户而
+        load_all_users全量拉取；JSON模式复用带mtime缓存的全量加载，
+        文件未变化时直接命中内存缓存，解析成本已被摊薄。
+        """
+        if self.mongodb_adapter:
+            try:
+                user_data = self.mongodb_adapter.load_user(username)
+                if user_data is not None:
+                    return user_data
+            except Exception as e:
+                logger.error(f"❌ 从MongoDB加载用户失败: {e}")
+
+        return self._load_users().get(username)
+
     def _save_users(self, users: Dict):
         """保存用户数据 - 同时保存到MongoDB和JSON文件"""
         # 优先保存到MongoDB
@@ -156,14 +351,75 @@ class UserManager:
                     self.mongodb_adapter.save_user(user_data)
             except Exception as e:
                 logger.error(f"❌ 保存用户到MongoDB失败: {e}")
-        
+
+            if not self.json_mirror:
+                # 跳过镜像写入时本地缓存不再可信，失效反向索引
+                self._email_index = None
+                return
+
         # 同时保存到JSON文件作为备份
         try:
-            with open(self.users_file, 'w', encoding='utf-8') as f:
-                json.dump(users, f, ensure_ascii=False, indent=2)
+            self._write_users_file(users)
         except Exception as e:
             logger.error(f"❌ 保存用户文件失败: {e}")
-    
+
+    def _write_users_file(self, users: Dict):
+        """写用户JSON文件并同步刷新内存缓存"""
+        with self._users_lock:
+            _write_json_file_atomic(self.users_file, users)
+            file_stat = self.users_file.stat()
+            self._users_cache = copy.deepcopy(users)
+            self._users_cache_key = (file_stat.st_mtime_ns, file_stat.st_size)
+
+        # 用户数据变更后同步重建邮箱反向索引
+        self._email_index = self._build_email_index(users)
+
+    @staticmethod
+    def _build_email_index(users: Dict) -> Dict[str, str]:
+        """构建email -> username反向索引"""
+        return {
+            user_data['email']: username
+            for username, user_data in users.items()
+            if user_data.get('email')
+        }
+
+    def _get_email_index(self, users: Dict) -> Dict[str, str]:
+        """获取邮箱反向索引，缓存失效时从传入的用户字典重建"""
+        if self._email_index is None:
+            self._email_index = self._build_email_index(users)
+        return self._email_index
+
+    def _save_users_delta(self, users: Dict, updates_by_user: Dict[str, Dict]):
+        """只持久化发生变更的用户字段
+
+        MongoDB模式下对每个变更用户做定向$set更新，代替_save_users对
+        全部用户的整文档重写（登录通常只改last_login一个字段）；
+        JSON备份文件仍整体刷新一次，保持降级路径数据最新。
+        """
+        if not updates_by_user:
+            return
+
+        if self.mongodb_adapter:
+            try:
+                for username, updates in updates_by_user.items():
+                    if not self.mongodb_adapter.update_user(username, updates):
+                        # 用户文档尚不存在于MongoDB（如数据仍在JSON中）时整体补写
+                        self.mongodb_adapter.save_user(users[username])
+            except Exception as e:
+                logger.error(f"❌ 更新用户到MongoDB失败: {e}")
+
+            if not self.json_mirror:
+                self._email_index = None
+                return
+
+            try:
+                self._write_users_file(users)
+            except Exception as e:
+                logger.error(f"❌ 保存用户文件失败: {e}")
+            return
+
+        self._save_users(users)
+
     def _load_sessions(self) -> Dict:
         """加载会话数据 - 优先从MongoDB，降级到JSON文件"""
         # 优先尝试从MongoDB加载
@@ -175,16 +431,18 @@ class UserManager:
             except Exception as e:
                 logger.error(f"❌ 从MongoDB加载会话失败: {e}")
         
-        # 降级到JSON文件
+        # 降级到SQLite
         try:
-            with open(self.sessions_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            rows = self._sessions_db.execute(
+                "SELECT token, username, created_at, expires_at, last_activity FROM sessions"
+            ).fetchall()
+            return {row[0]: dict(zip(self._SESSION_COLUMNS, row)) for row in rows}
         except Exception as e:
-            logger.error(f"❌ 加载会话文件失败: {e}")
+            logger.error(f"❌ 加载会话数据库失败: {e}")
             return {}
     
     def _save_sessions(self, sessions: Dict):
-        """保存会话数据 - 同时保存到MongoDB和JSON文件"""
+        """保存会话数据 - 同时保存到MongoDB和SQLite（全量同步，含删除）"""
         # 优先保存到MongoDB
         if self.mongodb_adapter:
             try:
@@ -192,42 +450,162 @@ class UserManager:
                     self.mongodb_adapter.save_session(session_data)
             except Exception as e:
                 logger.error(f"❌ 保存会话到MongoDB失败: {e}")
-        
-        # 同时保存到JSON文件作为备份
+
+            if not self.json_mirror:
+                return
+
+        # 同时写入SQLite作为备份
         try:
-            with open(self.sessions_file, 'w', encoding='utf-8') as f:
-                json.dump(sessions, f, ensure_ascii=False, indent=2)
+            with self._sessions_lock:
+                self._sessions_db.execute("DELETE FROM sessions")
+                self._sessions_db.executemany(
+                    "INSERT OR REPLACE INTO sessions"
+                    " (token, username, created_at, expires_at, last_activity)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    [
+                        tuple(session_data.get(col) for col in self._SESSION_COLUMNS)
+                        for session_data in sessions.values()
+                    ]
+                )
+                self._sessions_db.commit()
         except Exception as e:
-            logger.error(f"❌ 保存会话文件失败: {e}")
+            logger.error(f"❌ 保存会话数据库失败: {e}")
+
+    def _save_user(self, username: str, user_data: Dict, users: Optional[Dict] = None):
+        """单用户保存：MongoDB只写一个文档，JSON备份整体刷新一次
+
+        代替_save_users对全部用户逐个重新上传的O(N)写放大；
+        users为包含本次改动的完整字典，省略时仅在需要写JSON备份时按需加载。
+        """
+        user_data.setdefault('username', username)
+
+        if self.mongodb_adapter:
+            try:
+                self.mongodb_adapter.save_user(user_data)
+            except Exception as e:
+                logger.error(f"❌ 保存用户到MongoDB失败: {e}")
+
+            if not self.json_mirror:
+                self._email_index = None
+                return
+
+        try:
+            if users is None:
+                users = self._load_users()
+                users[username] = user_data
+            self._write_users_file(users)
+        except Exception as e:
+            logger.error(f"❌ 保存用户文件失败: {e}")
+
+    def _save_session(self, token: str, session_data: Dict):
+        """单会话保存：MongoDB只写一个文档，SQLite单行INSERT OR REPLACE"""
+        if self.mongodb_adapter:
+            try:
+                self.mongodb_adapter.save_session(session_data)
+            except Exception as e:
+                logger.error(f"❌ 保存会话到MongoDB失败: {e}")
+
+            if not self.json_mirror:
+                return
+
+        try:
+            with self._sessions_lock:
+                self._sessions_db.execute(
+                    "INSERT OR REPLACE INTO sessions"
+                    " (token, username, created_at, expires_at, last_activity)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    tuple(session_data.get(col) for col in self._SESSION_COLUMNS)
+                )
+                self._sessions_db.commit()
+        except Exception as e:
+            logger.error(f"❌ 保存会话数据库失败: {e}")
     
     def _hash_password(self, password: str) -> str:
-        """哈希密码"""
+        """哈希密码（默认bcrypt，自动加盐；bcrypt不可用时回退SHA-256）"""
+        if self.password_hash_algorithm == 'bcrypt' and BCRYPT_AVAILABLE:
+            return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.bcrypt_cost)).decode()
         return hashlib.sha256(password.encode()).hexdigest()
+
+    def _verify_password(self, password: str, stored_hash: str) -> bool:
+        """校验密码与存储哈希是否匹配
+
+        bcrypt哈希以$2开头；旧的SHA-256十六进制哈希走常数时间比较的
+        遗留分支，由调用方在登录成功后透明升级。
+        """
+        if not stored_hash:
+            return False
+
+        if stored_hash.startswith('$2'):
+            if not BCRYPT_AVAILABLE:
+                logger.error("❌ 存储的密码哈希为bcrypt格式，但bcrypt未安装")
+                return False
+
+            # bcrypt校验故意昂贵（约百毫秒级），同一进程内重复登录按
+            # (口令SHA-256摘要, 存储哈希)记忆化，不在内存中保留明文口令
+            cache_key = (hashlib.sha256(password.encode()).hexdigest(), stored_hash)
+            cached = self._verify_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            result = bcrypt.checkpw(password.encode(), stored_hash.encode())
+
+            if len(self._verify_cache) >= self._verify_cache_max:
+                self._verify_cache.clear()
+            self._verify_cache[cache_key] = result
+            return result
+
+        # 遗留SHA-256哈希：bytes入参走compare_digest的C实现定时比较路径
+        computed = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(computed.encode(), stored_hash.encode())
+
+    def _needs_rehash(self, stored_hash: str) -> bool:
+        """判断存储哈希是否需要升级为当前算法"""
+        return (self.password_hash_algorithm == 'bcrypt' and BCRYPT_AVAILABLE
+                and not stored_hash.startswith('$2'))
     
     def _generate_session_token(self) -> str:
         """生成会话令牌"""
         return secrets.token_urlsafe(32)
+
+    def _activity_needs_update(self, session_data: Dict, now: datetime) -> bool:
+        """判断last_activity是否需要落盘（距上次写入超过节流间隔）"""
+        last_activity = session_data.get('last_activity')
+        if not last_activity:
+            return True
+        try:
+            elapsed = (now - datetime.fromisoformat(last_activity)).total_seconds()
+        except ValueError:
+            return True
+        return elapsed >= self.activity_update_interval
     
     def validate_password(self, password: str) -> tuple[bool, List[str]]:
         """验证密码强度"""
         errors = []
-        
+
         if len(password) < self.min_password_length:
             errors.append(f"密码长度至少需要{self.min_password_length}位")
-        
-        if not any(c.isdigit() for c in password):
+
+        # 单次遍历同时检查数字和字母，条件都满足后提前退出
+        has_digit = has_alpha = False
+        for c in password:
+            if c.isdigit():
+                has_digit = True
+            elif c.isalpha():
+                has_alpha = True
+            if has_digit and has_alpha:
+                break
+
+        if not has_digit:
             errors.append("密码至少包含一个数字")
-        
-        if not any(c.isalpha() for c in password):
+
+        if not has_alpha:
             errors.append("密码至少包含一个字母")
-        
+
         return len(errors) == 0, errors
     
     def validate_email(self, email: str) -> bool:
         """验证邮箱格式"""
-        import re
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
+        return _EMAIL_RE.match(email) is not None
     
     def register_user(self, username: str, email: str, password: str, full_name: str = "") -> tuple[bool, str]:
         """注册新用户"""
@@ -252,10 +630,9 @@ class UserManager:
             if username in users:
                 return False, "用户名已存在"
             
-            # 检查邮箱是否已被使用
-            for user_data in users.values():
-                if user_data.get('email') == email:
-                    return False, "邮箱已被使用"
+            # 检查邮箱是否已被使用（反向索引代替全量扫描）
+            if email in self._get_email_index(users):
+                return False, "邮箱已被使用"
             
             # 创建新用户
             user_data = {
@@ -274,8 +651,8 @@ class UserManager:
             }
             
             users[username] = user_data
-            self._save_users(users)
-            
+            self._save_user(username, user_data, users)
+
             logger.info(f"👤 新用户注册成功: {username} ({email})")
             return True, "注册成功！"
             
@@ -286,11 +663,47 @@ class UserManager:
     def authenticate_user(self, username: str, password: str) -> tuple[bool, str, Optional[Dict]]:
         """验证用户登录"""
         try:
+            self._ensure_default_admin()
+
             if not username or not password:
                 return False, "用户名和密码不能为空", None
-            
+
+            # MongoDB模式：先用窄投影只取认证字段，失败的登录尝试
+            # （错误密码、禁用账户）无需传输和反序列化完整用户文档
+            if self.mongodb_adapter:
+                auth_doc = self.mongodb_adapter.load_user_for_auth(username)
+                if auth_doc is not None:
+                    if not auth_doc.get('is_active', True):
+                        logger.warning(f"⚠️ 登录失败 - 用户已被禁用: {username}")
+                        return False, "用户账户已被禁用", None
+
+                    if not self._verify_password(password, auth_doc['password_hash']):
+                        logger.warning(f"⚠️ 登录失败 - 密码错误: {username}")
+                        return False, "用户名或密码错误", None
+
+                    now = datetime.now()
+                    updates = {
+                        'last_login': now.isoformat(),
+                        # 预格式化展示串，侧边栏渲染无需每次rerun再做fromisoformat
+                        'last_login_display': now.strftime('%m-%d %H:%M'),
+                    }
+
+                    # 旧SHA-256哈希在登录成功后透明升级为bcrypt
+                    if self._needs_rehash(auth_doc['password_hash']):
+                        updates['password_hash'] = self._hash_password(password)
+                        logger.info(f"🔐 密码哈希已升级为bcrypt: {username}")
+
+                    self.mongodb_adapter.update_user(username, updates)
+
+                    # 校验通过后才取完整文档返回给调用方
+                    user_data = self.mongodb_adapter.load_user(username) or {}
+
+                    logger.info(f"✅ 用户登录成功: {username}")
+                    return True, "登录成功", user_data
+                # MongoDB中无此用户时继续走JSON路径（数据可能尚未迁移）
+
             users = self._load_users()
-            
+
             if username not in users:
                 logger.warning(f"⚠️ 登录失败 - 用户不存在: {username}")
                 return False, "用户名或密码错误", None
@@ -302,66 +715,155 @@ class UserManager:
                 return False, "用户账户已被禁用", None
             
             # 验证密码
-            password_hash = self._hash_password(password)
-            if password_hash != user_data['password_hash']:
+            if not self._verify_password(password, user_data['password_hash']):
                 logger.warning(f"⚠️ 登录失败 - 密码错误: {username}")
                 return False, "用户名或密码错误", None
-            
-            # 更新最后登录时间
-            user_data['last_login'] = datetime.now().isoformat()
+
+            # 登录只改动个别字段，按字段增量持久化
+            now = datetime.now()
+            updates = {
+                'last_login': now.isoformat(),
+                # 预格式化展示串，侧边栏渲染无需每次rerun再做fromisoformat
+                'last_login_display': now.strftime('%m-%d %H:%M'),
+            }
+
+            # 旧SHA-256哈希在登录成功后透明升级为bcrypt
+            if self._needs_rehash(user_data['password_hash']):
+                updates['password_hash'] = self._hash_password(password)
+                logger.info(f"🔐 密码哈希已升级为bcrypt: {username}")
+
+            user_data.update(updates)
             users[username] = user_data
-            self._save_users(users)
-            
+            self._save_users_delta(users, {username: updates})
+
             logger.info(f"✅ 用户登录成功: {username}")
             return True, "登录成功", user_data
             
         except Exception as e:
             logger.error(f"❌ 用户认证失败: {e}")
             return False, f"登录失败：{str(e)}", None
-    
+
+    def authenticate_many(self, pairs: List[tuple]) -> List[tuple[bool, str, Optional[Dict]]]:
+        """批量验证用户登录
+
+        一次加载用户数据并批量计算密码哈希，替代逐条调用authenticate_user时
+        反复读取用户文件的开销。返回结果与authenticate_user逐条调用一致。
+        """
+        try:
+            self._ensure_default_admin()
+            users = self._load_users()
+
+            results = []
+            updates_by_user: Dict[str, Dict] = {}
+
+            for username, password in pairs:
+                if not username:
+                    results.append((False, "用户名和密码不能为空", None))
+                    continue
+
+                user_data = users.get(username)
+                if user_data is None:
+                    logger.warning(f"⚠️ 登录失败 - 用户不存在: {username}")
+                    results.append((False, "用户名或密码错误", None))
+                    continue
+
+                if not user_data.get('is_active', True):
+                    logger.warning(f"⚠️ 登录失败 - 用户已被禁用: {username}")
+                    results.append((False, "用户账户已被禁用", None))
+                    continue
+
+                if not self._verify_password(password, user_data['password_hash']):
+                    logger.warning(f"⚠️ 登录失败 - 密码错误: {username}")
+                    results.append((False, "用户名或密码错误", None))
+                    continue
+
+                # 登录只改动个别字段，按字段增量持久化
+                now = datetime.now()
+                updates = {
+                    'last_login': now.isoformat(),
+                    'last_login_display': now.strftime('%m-%d %H:%M'),
+                }
+
+                # 旧SHA-256哈希在登录成功后透明升级为bcrypt
+                if self._needs_rehash(user_data['password_hash']):
+                    updates['password_hash'] = self._hash_password(password)
+                    logger.info(f"🔐 密码哈希已升级为bcrypt: {username}")
+
+                user_data.update(updates)
+                users[username] = user_data
+                updates_by_user[username] = updates
+
+                logger.info(f"✅ 用户登录成功: {username}")
+                results.append((True, "登录成功", user_data))
+
+            # 所有成功登录只触发一次保存
+            self._save_users_delta(users, updates_by_user)
+
+            return results
+
+        except Exception as e:
+            logger.error(f"❌ 批量用户认证失败: {e}")
+            return [(False, f"登录失败：{str(e)}", None) for _ in pairs]
+
+    def verify_credentials_batch(self, pairs: List[tuple]) -> List[bool]:
+        """批量校验用户名/密码组合
+
+        只加载一次用户数据，供测试脚本一次性校验多组凭据；
+        与authenticate_many不同，不产生更新last_login等登录副作用。
+        """
+        try:
+            self._ensure_default_admin()
+            users = self._load_users()
+
+            return [
+                (user_data := users.get(username)) is not None
+                and user_data.get('is_active', True)
+                and self._verify_password(password, user_data.get('password_hash', ''))
+                for username, password in pairs
+            ]
+        except Exception as e:
+            logger.error(f"❌ 批量凭据校验失败: {e}")
+            return [False] * len(pairs)
+
     def create_session(self, username: str) -> str:
         """创建用户会话"""
         try:
             token = self._generate_session_token()
-            
-            # 清理该用户的旧会话
-            if self.mongodb_adapter:
-                self.mongodb_adapter.delete_user_sessions(username)
-            
-            # 创建新会话数据
-            expire_time = datetime.now() + timedelta(hours=self.session_expire_hours)
+
+            # 创建新会话数据（时间戳只取一次，三个字段保持同一时刻）
+            now = datetime.now()
+            now_iso = now.isoformat()
+            expire_time = now + timedelta(hours=self.session_expire_hours)
             session_data = {
                 'token': token,
                 'username': username,
-                'created_at': datetime.now().isoformat(),
+                'created_at': now_iso,
                 'expires_at': expire_time.isoformat(),
-                'last_activity': datetime.now().isoformat()
+                'last_activity': now_iso
             }
             
-            # 优先保存到MongoDB
+            # 优先保存到MongoDB：单次upsert同时替换掉该用户的旧会话，
+            # 不再先delete再insert两次往返
             if self.mongodb_adapter:
-                success = self.mongodb_adapter.save_session(session_data)
+                success = self.mongodb_adapter.replace_user_session(username, session_data)
                 if success:
                     logger.info(f"🔑 创建用户会话(MongoDB): {username} -> {token[:8]}...")
                     return token
             
-            # 降级到JSON文件
-            sessions = self._load_sessions()
-            
-            # 清理该用户的旧会话
-            sessions_to_remove = []
-            for session_token, session_info in sessions.items():
-                if session_info.get('username') == username:
-                    sessions_to_remove.append(session_token)
-            
-            for old_token in sessions_to_remove:
-                del sessions[old_token]
-            
-            # 添加新会话
-            sessions[token] = session_data
-            self._save_sessions(sessions)
-            
-            logger.info(f"🔑 创建用户会话(JSON): {username} -> {token[:8]}...")
+            # 降级到SQLite：清理该用户旧会话（走username索引）并插入新会话
+            with self._sessions_lock:
+                self._sessions_db.execute(
+                    "DELETE FROM sessions WHERE username = ?", (username,)
+                )
+                self._sessions_db.execute(
+                    "INSERT OR REPLACE INTO sessions"
+                    " (token, username, created_at, expires_at, last_activity)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    tuple(session_data.get(col) for col in self._SESSION_COLUMNS)
+                )
+                self._sessions_db.commit()
+
+            logger.info(f"🔑 创建用户会话(SQLite): {username} -> {token[:8]}...")
             return token
             
         except Exception as e:
@@ -374,48 +876,60 @@ class UserManager:
             if not token:
                 return False, None
             
+            # 每次校验只取一次当前时间，过期判断与活动时间更新共用
+            now = datetime.now()
+
             # 优先从MongoDB验证
             if self.mongodb_adapter:
                 session_data = self.mongodb_adapter.load_session(token)
                 if session_data:
                     # 检查会话是否过期
                     expire_time = datetime.fromisoformat(session_data['expires_at'])
-                    if datetime.now() > expire_time:
+                    if now > expire_time:
                         # 删除过期会话
                         self.mongodb_adapter.delete_session(token)
                         logger.info(f"🔑 删除过期会话(MongoDB): {token[:8]}...")
                         return False, None
-                    
-                    # 更新最后活动时间
-                    updates = {'last_activity': datetime.now().isoformat()}
-                    session_data.update(updates)
-                    self.mongodb_adapter.save_session(session_data)
-                    
+
+                    # 更新最后活动时间（节流：间隔内的重复校验只读不写）
+                    if self._activity_needs_update(session_data, now):
+                        session_data['last_activity'] = now.isoformat()
+                        self.mongodb_adapter.save_session(session_data)
+
                     return True, session_data['username']
             
-            # 降级到JSON文件验证
-            sessions = self._load_sessions()
-            
-            if token not in sessions:
+            # 降级到SQLite验证：按token主键单行查询，不再加载全部会话
+            row = self._sessions_db.execute(
+                "SELECT username, expires_at, last_activity FROM sessions WHERE token = ?",
+                (token,)
+            ).fetchone()
+
+            if row is None:
                 return False, None
-            
-            session_data = sessions[token]
-            
+
+            username, expires_at, last_activity = row
+
             # 检查会话是否过期
-            expire_time = datetime.fromisoformat(session_data['expires_at'])
-            if datetime.now() > expire_time:
+            if now > datetime.fromisoformat(expires_at):
                 # 删除过期会话
-                del sessions[token]
-                self._save_sessions(sessions)
-                logger.info(f"🔑 删除过期会话(JSON): {token[:8]}...")
+                with self._sessions_lock:
+                    self._sessions_db.execute(
+                        "DELETE FROM sessions WHERE token = ?", (token,)
+                    )
+                    self._sessions_db.commit()
+                logger.info(f"🔑 删除过期会话(SQLite): {token[:8]}...")
                 return False, None
-            
-            # 更新最后活动时间
-            session_data['last_activity'] = datetime.now().isoformat()
-            sessions[token] = session_data
-            self._save_sessions(sessions)
-            
-            return True, session_data['username']
+
+            # 更新最后活动时间（节流：间隔内的重复校验只读不写）
+            if self._activity_needs_update({'last_activity': last_activity}, now):
+                with self._sessions_lock:
+                    self._sessions_db.execute(
+                        "UPDATE sessions SET last_activity = ? WHERE token = ?",
+                        (now.isoformat(), token)
+                    )
+                    self._sessions_db.commit()
+
+            return True, username
             
         except Exception as e:
             logger.error(f"❌ 会话验证失败: {e}")
@@ -436,14 +950,18 @@ class UserManager:
                     logger.info(f"🔑 销毁用户会话(MongoDB): {username} -> {token[:8]}...")
                     return
             
-            # 降级到JSON文件删除
-            sessions = self._load_sessions()
-            
-            if token in sessions:
-                username = sessions[token].get('username', 'unknown')
-                del sessions[token]
-                self._save_sessions(sessions)
-                logger.info(f"🔑 销毁用户会话(JSON): {username} -> {token[:8]}...")
+            # 降级到SQLite删除
+            row = self._sessions_db.execute(
+                "SELECT username FROM sessions WHERE token = ?", (token,)
+            ).fetchone()
+
+            if row:
+                with self._sessions_lock:
+                    self._sessions_db.execute(
+                        "DELETE FROM sessions WHERE token = ?", (token,)
+                    )
+                    self._sessions_db.commit()
+                logger.info(f"🔑 销毁用户会话(SQLite): {row[0]} -> {token[:8]}...")
             
         except Exception as e:
             logger.error(f"❌ 销毁会话失败: {e}")
@@ -451,17 +969,44 @@ class UserManager:
     def get_user_info(self, username: str) -> Optional[Dict]:
         """获取用户信息"""
         try:
-            users = self._load_users()
-            if username in users:
-                user_data = users[username].copy()
+            # JSON模式：整表脱敏视图随users缓存版本一次性构建，
+            # 之后的查询只做字典取值+浅拷贝，不再逐次copy+pop
+            if not self.mongodb_adapter:
+                public_users = self._get_public_users()
+                user_data = public_users.get(username)
+                # 浅拷贝防止调用方（如session_state里的就地update）污染视图
+                return dict(user_data) if user_data is not None else None
+
+            user_data = self._load_single_user(username)
+            if user_data is not None:
+                user_data = user_data.copy()
                 # 移除敏感信息
                 user_data.pop('password_hash', None)
                 return user_data
             return None
-            
+
         except Exception as e:
             logger.error(f"❌ 获取用户信息失败: {e}")
             return None
+
+    def _get_public_users(self) -> Dict[str, Dict]:
+        """获取脱敏用户视图（惰性构建，随users缓存版本失效）"""
+        try:
+            file_stat = self.users_file.stat()
+            version = (file_stat.st_mtime_ns, file_stat.st_size)
+        except OSError:
+            version = None
+
+        if self._public_users is not None and version is not None and self._public_users_key == version:
+            return self._public_users
+
+        users = self._load_users()
+        self._public_users = {
+            name: {k: v for k, v in data.items() if k != 'password_hash'}
+            for name, data in users.items()
+        }
+        self._public_users_key = self._users_cache_key
+        return self._public_users
     
     def update_user_info(self, username: str, updates: Dict) -> tuple[bool, str]:
         """更新用户信息"""
@@ -483,16 +1028,16 @@ class UserManager:
                         if not self.validate_email(value):
                             return False, "邮箱格式不正确"
                         
-                        # 检查邮箱是否已被其他用户使用
-                        for other_username, other_user_data in users.items():
-                            if other_username != username and other_user_data.get('email') == value:
-                                return False, "邮箱已被使用"
+                        # 检查邮箱是否已被其他用户使用（反向索引代替全量扫描）
+                        owner = self._get_email_index(users).get(value)
+                        if owner is not None and owner != username:
+                            return False, "邮箱已被使用"
                     
                     user_data[field] = value
             
             user_data['updated_at'] = datetime.now().isoformat()
             users[username] = user_data
-            self._save_users(users)
+            self._save_user(username, user_data, users)
             
             logger.info(f"👤 用户信息更新成功: {username}")
             return True, "信息更新成功"
@@ -504,16 +1049,13 @@ class UserManager:
     def change_password(self, username: str, old_password: str, new_password: str) -> tuple[bool, str]:
         """修改密码"""
         try:
-            users = self._load_users()
-            
-            if username not in users:
+            user_data = self._load_single_user(username)
+
+            if user_data is None:
                 return False, "用户不存在"
-            
-            user_data = users[username]
-            
+
             # 验证旧密码
-            old_password_hash = self._hash_password(old_password)
-            if old_password_hash != user_data['password_hash']:
+            if not self._verify_password(old_password, user_data['password_hash']):
                 return False, "当前密码错误"
             
             # 验证新密码
@@ -524,8 +1066,10 @@ class UserManager:
             # 更新密码
             user_data['password_hash'] = self._hash_password(new_password)
             user_data['password_changed_at'] = datetime.now().isoformat()
-            users[username] = user_data
-            self._save_users(users)
+            self._save_user(username, user_data)
+
+            # 旧哈希的记忆化校验结果立即作废
+            self._verify_cache.clear()
             
             logger.info(f"🔐 用户密码修改成功: {username}")
             return True, "密码修改成功"
@@ -537,30 +1081,23 @@ class UserManager:
     def cleanup_expired_sessions(self):
         """清理过期会话"""
         try:
-            total_cleaned = 0
-            
-            # 优先清理MongoDB中的过期会话
+            # MongoDB的过期会话由TTL索引后台回收，适配器只返回等待回收的
+            # 数量，仅作记录，不计入本次实际删除数
             if self.mongodb_adapter:
-                mongo_cleaned = self.mongodb_adapter.cleanup_expired_sessions()
-                total_cleaned += mongo_cleaned
-            
-            # 同时清理JSON文件中的过期会话
-            sessions = self._load_sessions()
-            current_time = datetime.now()
-            
-            expired_sessions = []
-            for token, session_data in sessions.items():
-                expire_time = datetime.fromisoformat(session_data['expires_at'])
-                if current_time > expire_time:
-                    expired_sessions.append(token)
-            
-            for token in expired_sessions:
-                del sessions[token]
-            
-            if expired_sessions:
-                self._save_sessions(sessions)
-                total_cleaned += len(expired_sessions)
-            
+                mongo_pending = self.mongodb_adapter.cleanup_expired_sessions()
+                if mongo_pending > 0:
+                    logger.info(f"🧹 {mongo_pending} 个过期会话等待MongoDB TTL回收")
+
+            # 同时清理SQLite中的过期会话：isoformat时间戳按字典序
+            # 即按时间排序，单条DELETE在服务端完成过滤
+            with self._sessions_lock:
+                cursor = self._sessions_db.execute(
+                    "DELETE FROM sessions WHERE expires_at < ?",
+                    (datetime.now().isoformat(),)
+                )
+                self._sessions_db.commit()
+            total_cleaned = cursor.rowcount
+
             if total_cleaned > 0:
                 logger.info(f"🧹 清理了 {total_cleaned} 个过期会话")
             
@@ -576,22 +1113,21 @@ class UserManager:
                 if stats and stats['total_users'] > 0:
                     return stats
             
-            # 降级到JSON文件统计
+            # 降级到本地文件统计（会话计数直接在SQLite里完成）
             users = self._load_users()
-            sessions = self._load_sessions()
-            
-            active_sessions = 0
-            current_time = datetime.now()
-            
-            for session_data in sessions.values():
-                expire_time = datetime.fromisoformat(session_data['expires_at'])
-                if current_time <= expire_time:
-                    active_sessions += 1
-            
+
+            now_iso = datetime.now().isoformat()
+            total_sessions = self._sessions_db.execute(
+                "SELECT COUNT(*) FROM sessions"
+            ).fetchone()[0]
+            active_sessions = self._sessions_db.execute(
+                "SELECT COUNT(*) FROM sessions WHERE expires_at >= ?", (now_iso,)
+            ).fetchone()[0]
+
             return {
                 'total_users': len(users),
                 'active_sessions': active_sessions,
-                'total_sessions': len(sessions)
+                'total_sessions': total_sessions
             }
             
         except Exception as e:
@@ -627,10 +1163,31 @@ def check_authentication() -> tuple[bool, Optional[str]]:
             del st.session_state['auth_token']
         if 'username' in st.session_state:
             del st.session_state['username']
-    
+        st.session_state['_auth_state'] = 'anon'
+
     return is_valid, username
 
 
+def get_current_user_info() -> Optional[Dict]:
+    """获取当前登录用户的脱敏信息
+
+    优先返回登录时写入session_state的副本；缺失时（如进程重启后恢复的
+    旧会话）按需加载一次并回填，后续rerun不再触达存储后端。
+    """
+    user_info = st.session_state.get('user_info')
+    if user_info:
+        return user_info
+
+    username = st.session_state.get('username')
+    if not username:
+        return None
+
+    user_info = get_user_manager().get_user_info(username)
+    if user_info:
+        st.session_state['user_info'] = user_info
+    return user_info
+
+
 def require_authentication():
     """装饰器：要求用户登录"""
     is_authenticated, username = check_authentication()
@@ -654,7 +1211,10 @@ def logout_user():
     for key in ['auth_token', 'username', 'user_info']:
         if key in st.session_state:
             del st.session_state[key]
-    
+
+    # 标记未登录状态，侧边栏等高频渲染路径据此跳过会话校验
+    st.session_state['_auth_state'] = 'anon'
+
     logger.info("👋 用户已登出")
 
 
@@ -670,11 +1230,16 @@ def login_user(username: str, password: str) -> tuple[bool, str]:
         token = user_manager.create_session(username)
         
         if token:
-            # 保存到session state
+            # 保存到session state：剔除密码哈希后的副本供各页面直接复用，
+            # 渲染路径不必每次rerun再查询存储后端
+            user_info = dict(user_data)
+            user_info.pop('password_hash', None)
+
             st.session_state['auth_token'] = token
             st.session_state['username'] = username
-            st.session_state['user_info'] = user_data
-            
+            st.session_state['user_info'] = user_info
+            st.session_state['_auth_state'] = 'authed'
+
             logger.info(f"👤 用户登录成功: {username}")
             return True, "登录成功！"
         else: